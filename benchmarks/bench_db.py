@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Database benchmark - simulates the per-message workload of the bot
+(history insert, history fetch, retention cleanup) against a default and a
+tuned SQLite connection profile.
+
+Usage:
+    python -m benchmarks.bench_db [--messages 2000] [--peers 20]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db import Database  # noqa: E402
+
+
+PROFILES = {
+    # Plain SQLite defaults: rollback journal, synchronous=FULL
+    "default": dict(pragmas={}, journal_mode="DELETE"),
+    # Profile used by the bot: WAL + SQLITE_PRAGMAS
+    "tuned": dict(),
+    # Tuned profile partitioned across 4 files by peer_id
+    "sharded": dict(shards=4),
+}
+
+
+async def run_profile(name: str, messages: int, peers: int, memory_size: int) -> float:
+    """Run the message workload and return elapsed seconds."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"), **PROFILES[name])
+        await db.init_db()
+        for peer in range(peers):
+            await db.get_or_create_conversation(2000000000 + peer, 1)
+
+        async def peer_workload(peer_id: int, count: int):
+            for i in range(count):
+                await db.get_conversation_history(peer_id, limit=memory_size)
+                await db.add_message_to_history(peer_id, 1, f"message {i}", is_bot=False)
+                await db.add_message_to_history(peer_id, -1, f"reply {i}", is_bot=True)
+                await db.clear_old_history(peer_id, keep_last=memory_size * 2)
+
+        per_peer = max(1, messages // peers)
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            peer_workload(2000000000 + peer, per_peer) for peer in range(peers)
+        ))
+        elapsed = time.perf_counter() - start
+        await db.close()
+        return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--peers", type=int, default=20)
+    parser.add_argument("--memory-size", type=int, default=10)
+    args = parser.parse_args()
+
+    for name in PROFILES:
+        elapsed = await run_profile(name, args.messages, args.peers, args.memory_size)
+        print(f"{name:>8}: {elapsed:.2f}s total, "
+              f"{elapsed / args.messages * 1000:.2f} ms/message, "
+              f"{args.messages / elapsed:.0f} messages/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Retrieval memory benchmark - query latency of a PeerIndex holding N messages.
+
+The index is filled with random unit vectors (building 1M real embeddings
+only measures the vectorizer); queries are real texts, so the reported
+latency covers embedding, scoring, top-k selection and reading the hits.
+
+Usage:
+    python -m benchmarks.bench_memory [--messages 1000000] [--dim 256]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.vector_index import HashingVectorizer, PeerIndex  # noqa: E402
+
+
+QUERIES = [
+    "как там твой кот?",
+    "какая у тебя машина",
+    "кто вчера выиграл в футбол",
+    "поедешь на рыбалку в выходные?",
+    "сколько лет ты работаешь водителем",
+]
+
+
+def build_index(path: str, messages: int, dim: int, chunk: int = 100000) -> PeerIndex:
+    """Fill an index with random unit vectors in chunks."""
+    rng = np.random.default_rng(0)
+    index = PeerIndex(path, dim)
+    for start in range(0, messages, chunk):
+        count = min(chunk, messages - start)
+        vectors = rng.standard_normal((count, dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        records = [
+            {'id': start + i + 1, 'user_id': 1, 'is_bot': False, 'message': f"message {start + i}"}
+            for i in range(count)
+        ]
+        index.add(vectors, records)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval memory query latency.")
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    vectorizer = HashingVectorizer(args.dim)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "peer")
+
+        start = time.perf_counter()
+        index = build_index(path, args.messages, args.dim)
+        print(f"build: {time.perf_counter() - start:.1f}s for {index.size} messages, "
+              f"{index.size * args.dim * 4 / 2**20:.0f} MB of vectors")
+
+        start = time.perf_counter()
+        loaded = PeerIndex(path, args.dim)
+        loaded.load()
+        print(f"load:  {time.perf_counter() - start:.2f}s")
+
+        timings = []
+        for i in range(args.rounds):
+            start = time.perf_counter()
+            query = vectorizer.transform([QUERIES[i % len(QUERIES)]])[0]
+            hits = loaded.search(query, args.top_k)
+            loaded.get([row for _, row in hits])
+            timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    print(f"query: p50 {statistics.median(timings):.1f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms, "
+          f"max {timings[-1]:.1f} ms (top-{args.top_k}, {args.rounds} queries)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark - time until polling starts and first-reply latency right
+after a restart, with and without cache prewarming.
+
+Startup runs main.main() in a subprocess with polling stubbed out. First-reply
+latency runs MessageHandler against a populated database with a stub VK API
+and a zero-latency AI, so it measures only the bot's own work.
+
+Usage:
+    python -m benchmarks.bench_startup [--peers 500] [--messages 40] [--sample 50]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database.db import Database  # noqa: E402
+from database.memory import RetrievalMemory  # noqa: E402
+
+
+STARTUP_SCRIPT = """
+import time
+started = time.perf_counter()
+import asyncio, sys
+import main
+from vkbottle.bot import Bot
+
+async def run_polling(self, *args, **kwargs):
+    heavy = [m for m in ("openai", "flask", "numpy") if m in sys.modules]
+    print(f"{time.perf_counter() - started:.3f} {','.join(heavy) or '-'}")
+
+Bot.run_polling = run_polling
+asyncio.run(main.main())
+"""
+
+
+def measure_startup(db_path: str, rounds: int) -> None:
+    """Print time from interpreter start to run_polling, with defaults and long-term memory on."""
+    env = dict(
+        os.environ, VK="token", OPEN="key", DB_PATH=db_path, MEMORY_TOP_K="3", MEMORY_DIR=db_path + ".memory"
+    )
+    for name in ("HISTORY_ARCHIVE_PATH", "DB_SHARDS", "PREWARM_PEERS"):
+        env.pop(name, None)
+    timings, heavy = [], "-"
+    for _ in range(rounds):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout.split()
+        timings.append(float(output[0]) * 1000)
+        heavy = output[1]
+    print(f"startup to polling: median {statistics.median(timings):.0f} ms over {rounds} runs "
+          f"(heavy modules loaded before polling: {heavy})")
+
+
+class StubAPI:
+    class messages:
+        @staticmethod
+        async def set_activity(**kwargs):
+            pass
+
+
+class StubBot:
+    class on:
+        handler = None
+
+        @classmethod
+        def message(cls):
+            def decorator(func):
+                cls.handler = func
+                return func
+            return decorator
+
+    api = StubAPI()
+
+
+class StubAI:
+    async def generate_response(self, **kwargs):
+        return "ok"
+
+
+class StubMessage:
+    def __init__(self, peer_id: int, from_id: int, text: str):
+        self.peer_id = peer_id
+        self.from_id = from_id
+        self.text = text
+
+    async def answer(self, text: str):
+        pass
+
+
+async def populate(db: Database, peers: int, messages: int):
+    for i in range(peers):
+        peer_id = 2000000000 + i
+        await db.get_or_create_conversation(peer_id, 1)
+        await db.add_tracked_user(peer_id, 1)
+        for j in range(messages):
+            await db.add_message_to_history(peer_id, 1, f"message {j}")
+
+
+async def first_reply_latency(db_path: str, peers: int, sample: int, prewarm: bool) -> list:
+    """Time the first message of `sample` recently active peers on a fresh instance."""
+    from bot.handlers import MessageHandler
+
+    memory = RetrievalMemory(db_path + ".memory")
+    db = Database(db_path, memory=memory)
+    await db.init_db()
+    peer_ids = await db.get_recent_peers(sample)
+    if prewarm:
+        await asyncio.gather(db.prewarm(peer_ids), memory.warm_up())
+
+    handler = MessageHandler(StubBot(), db, StubAI(), memory)
+    handler.register_handlers()
+    timings = []
+    for peer_id in peer_ids:
+        started = time.perf_counter()
+        await StubBot.on.handler(StubMessage(peer_id, 1, "hello"))
+        timings.append((time.perf_counter() - started) * 1000)
+    await handler.background.drain()
+    await db.close()
+    return timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Startup and first-reply latency.")
+    parser.add_argument("--peers", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--sample", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    # vkbottle enables debug logging for aiosqlite, which would dominate timings
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db = Database(db_path)
+        await db.init_db()
+        await populate(db, args.peers, args.messages)
+        await db.close()
+
+        measure_startup(db_path, args.rounds)
+
+        for prewarm in (False, True):
+            timings = sorted(await first_reply_latency(db_path, args.peers, args.sample, prewarm))
+            label = "prewarmed" if prewarm else "cold"
+            print(f"first reply ({label:>9}): mean {statistics.mean(timings):.2f} ms, "
+                  f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms over {len(timings)} peers")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
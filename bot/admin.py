@@ -1,4 +1,7 @@
+from typing import Optional
 from vkbottle.bot import Message
+from bot.background import BackgroundTasks
+from bot.rate_limit import RateLimiter
 from database.db import Database
 import re
 
@@ -6,8 +9,15 @@ import re
 class AdminCommands:
     """Handler for admin commands."""
 
-    def __init__(self, db: Database):
+    def __init__(
+        self,
+        db: Database,
+        rate_limiter: Optional[RateLimiter] = None,
+        background: Optional[BackgroundTasks] = None
+    ):
         self.db = db
+        self.rate_limiter = rate_limiter
+        self.background = background
 
     async def handle_command(self, message: Message, command: str, args: str) -> str:
         """Route and handle admin commands."""
@@ -55,6 +65,12 @@ class AdminCommands:
         elif command == "размер_памяти":
             return await self._set_memory_size(peer_id, args)
 
+        elif command == "лимит_пользователя":
+            return await self._set_user_rate_limit(peer_id, args)
+
+        elif command == "лимит_беседы":
+            return await self._set_peer_rate_limit(peer_id, args)
+
         elif command == "добавить_пользователя":
             return await self._add_tracked_user(peer_id, args)
 
@@ -98,6 +114,8 @@ class AdminCommands:
 !длина_ответов [short/medium/long] - длина ответов
 !процент_ответов [1-100] - процент ответов на сообщения
 !размер_памяти [число] - количество запоминаемых сообщений
+!лимит_пользователя [число] - ответов одному пользователю в минуту (0 - без ограничений)
+!лимит_беседы [число] - ответов в беседе в минуту (0 - без ограничений)
 
 **Управление пользователями:**
 !добавить_пользователя [id] - добавить пользователя для отслеживания
@@ -206,6 +224,35 @@ class AdminCommands:
         await self.db.update_conversation(peer_id, memory_size=size)
         return f"✅ Размер памяти установлен: {size} сообщений"
 
+    async def _set_user_rate_limit(self, peer_id: int, args: str) -> str:
+        """Set per-user reply rate limit."""
+        try:
+            limit = int(args.strip())
+            if limit < 0:
+                raise ValueError
+        except ValueError:
+            return "❌ Укажите неотрицательное число (0 - без ограничений)"
+
+        await self.db.update_conversation(peer_id, user_rate_limit=limit)
+        return f"✅ Лимит ответов пользователю установлен: {self._format_rate_limit(limit)}"
+
+    async def _set_peer_rate_limit(self, peer_id: int, args: str) -> str:
+        """Set per-conversation reply rate limit."""
+        try:
+            limit = int(args.strip())
+            if limit < 0:
+                raise ValueError
+        except ValueError:
+            return "❌ Укажите неотрицательное число (0 - без ограничений)"
+
+        await self.db.update_conversation(peer_id, peer_rate_limit=limit)
+        return f"✅ Лимит ответов в беседе установлен: {self._format_rate_limit(limit)}"
+
+    @staticmethod
+    def _format_rate_limit(limit: int) -> str:
+        """Format a replies-per-minute limit for display."""
+        return f"{limit} в минуту" if limit > 0 else "без ограничений"
+
     async def _add_tracked_user(self, peer_id: int, args: str) -> str:
         """Add tracked user."""
         match = re.search(r'\[id(\d+)\|', args) or re.search(r'id(\d+)', args) or re.search(r'(\d+)', args)
@@ -251,7 +298,24 @@ class AdminCommands:
 **Длина ответов:** {config.get('response_length', 'medium')}
 **Процент ответов:** {config.get('response_percentage', 100)}%
 **Размер памяти:** {config.get('memory_size', 10)} сообщений
+**Лимит ответов пользователю:** {self._format_rate_limit(config.get('user_rate_limit', 6))}
+**Лимит ответов в беседе:** {self._format_rate_limit(config.get('peer_rate_limit', 20))}
 **Количество админов:** {len(admins)}
 **Отслеживаемых пользователей:** {len(tracked_users)}
 """
+        peer_limit = config.get('peer_rate_limit', 20)
+        if self.rate_limiter is not None:
+            if peer_limit > 0:
+                tokens = self.rate_limiter.peer_tokens(peer_id, peer_limit)
+                status += f"**Доступно ответов в беседе сейчас:** {tokens} из {peer_limit}\n"
+            stats = self.rate_limiter.stats()
+            status += (
+                f"**Активных лимитов:** {stats['user_buckets']} пользовательских, "
+                f"{stats['peer_buckets']} по беседам\n"
+            )
+        if self.background is not None:
+            status += (
+                f"**Фоновых задач в очереди:** {self.background.pending} "
+                f"(ошибок: {self.background.failed})\n"
+            )
         return status
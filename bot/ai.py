@@ -1,23 +1,43 @@
-import openai
 from typing import List, Dict, Optional, Any
+import asyncio
 import os
 
 
 class AIManager:
     """Manages AI interactions using OpenAI API."""
 
+    MAX_RECALLED_CHARS = 300  # Per recalled message in the system prompt
+
     def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
-        self.client = openai.AsyncOpenAI(api_key=api_key)
+        self.api_key = api_key
         self.model = model
+        self._client = None
+
+    @property
+    def client(self):
+        """OpenAI client, created on first use - importing openai is slow."""
+        if self._client is None:
+            import openai
+            self._client = openai.AsyncOpenAI(api_key=self.api_key)
+        return self._client
+
+    async def warm_up(self):
+        """Import openai and create the client in a worker thread before the first reply."""
+        await asyncio.to_thread(lambda: self.client)
 
     async def generate_response(
         self,
         brain_role: Optional[str],
         brain_task: Optional[str],
         conversation_history: List[Dict[str, Any]],
-        response_length: str = "medium"
+        response_length: str = "medium",
+        recalled_messages: Optional[List[Dict[str, Any]]] = None
     ) -> str:
-        """Generate AI response based on configuration and history."""
+        """Generate AI response based on configuration and history.
+
+        recalled_messages are older messages from long-term memory; they are
+        added to the system prompt, each truncated to keep the token cost fixed.
+        """
 
         # Build system prompt
         system_parts = []
@@ -38,6 +58,17 @@ class AIManager:
 
         system_prompt = " ".join(system_parts) if system_parts else "Ты дружелюбный собеседник. Не упоминай что ты ИИ."
 
+        # Add relevant older messages recalled from long-term memory
+        if recalled_messages:
+            recalled_lines = []
+            for msg in recalled_messages:
+                author = "Ты" if msg.get("is_bot") else "Собеседник"
+                text = msg["message"]
+                if len(text) > self.MAX_RECALLED_CHARS:
+                    text = text[:self.MAX_RECALLED_CHARS] + "…"
+                recalled_lines.append(f"- {author}: {text}")
+            system_prompt += "\n\nРанее в беседе упоминалось:\n" + "\n".join(recalled_lines)
+
         # Build messages for OpenAI
         messages = [{"role": "system", "content": system_prompt}]
 
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Hashable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTasks:
+    """Supervised runner for work that doesn't have to finish before a reply.
+
+    - Backpressure: at most ``max_pending`` tasks exist at once; ``submit``
+      waits for a free slot instead of letting the backlog grow unbounded.
+    - Ordering: tasks submitted with the same key run one after another in
+      submission order (e.g. history writes of one conversation).
+    - Supervision: failures are logged and counted, never lost silently.
+    """
+
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self.failed = 0
+        self._slots = asyncio.Semaphore(max_pending)
+        self._tasks: Set[asyncio.Task] = set()
+        self._tails: Dict[Hashable, asyncio.Task] = {}
+
+    async def submit(self, coro: Awaitable[Any], key: Optional[Hashable] = None, name: str = "background task"):
+        """Schedule coro, waiting while max_pending tasks are already queued."""
+        await self._slots.acquire()
+
+        previous = self._tails.get(key) if key is not None else None
+        task = asyncio.create_task(self._run(coro, previous))
+        self._tasks.add(task)
+        if key is not None:
+            self._tails[key] = task
+        task.add_done_callback(lambda t: self._on_done(t, key, name))
+
+    @staticmethod
+    async def _run(coro: Awaitable[Any], previous: Optional[asyncio.Task]):
+        if previous is not None:
+            # Only wait for the previous task; its errors are reported by itself
+            await asyncio.wait([previous])
+        await coro
+
+    def _on_done(self, task: asyncio.Task, key: Optional[Hashable], name: str):
+        self._tasks.discard(task)
+        self._slots.release()
+        if key is not None and self._tails.get(key) is task:
+            del self._tails[key]
+
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            self.failed += 1
+            logger.error(f"{name} failed (key={key}): {exc}", exc_info=exc)
+
+    @property
+    def pending(self) -> int:
+        """Number of tasks that have not finished yet."""
+        return len(self._tasks)
+
+    async def drain(self):
+        """Wait for all submitted tasks to finish."""
+        while self._tasks:
+            await asyncio.wait(list(self._tasks))
@@ -3,20 +3,32 @@ from vkbottle import BaseStateGroup
 from database.db import Database
 from bot.ai import AIManager
 from bot.admin import AdminCommands
+from bot.rate_limit import RateLimiter
+from bot.background import BackgroundTasks
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+import asyncio
 import random
 import logging
 
+if TYPE_CHECKING:
+    from database.memory import RetrievalMemory
+
 logger = logging.getLogger(__name__)
 
 
 class MessageHandler:
     """Main message handler for the bot."""
 
-    def __init__(self, bot: Bot, db: Database, ai: AIManager):
+    TYPING_INTERVAL = 4.0  # seconds between typing indicator refreshes
+
+    def __init__(self, bot: Bot, db: Database, ai: AIManager, memory: Optional["RetrievalMemory"] = None):
         self.bot = bot
         self.db = db
         self.ai = ai
-        self.admin_commands = AdminCommands(db)
+        self.memory = memory
+        self.rate_limiter = RateLimiter()
+        self.background = BackgroundTasks()
+        self.admin_commands = AdminCommands(db, self.rate_limiter, self.background)
 
     def register_handlers(self):
         """Register all message handlers."""
@@ -33,11 +45,21 @@ class MessageHandler:
                 user_id = message.from_id
                 text = message.text
 
-                # Initialize conversation if not exists (first message sets sender as admin)
-                config = await self.db.get_or_create_conversation(peer_id, user_id)
+                is_command = bool(text) and text.startswith('!')
+
+                # Initialize conversation if not exists (first message sets sender as admin),
+                # checking tracking at the same time - the two reads are independent
+                if is_command:
+                    config = await self.db.get_or_create_conversation(peer_id, user_id)
+                    is_tracked = False
+                else:
+                    config, is_tracked = await asyncio.gather(
+                        self.db.get_or_create_conversation(peer_id, user_id),
+                        self.db.is_tracked_user(peer_id, user_id)
+                    )
 
                 # Check for admin commands (start with !)
-                if text and text.startswith('!'):
+                if is_command:
                     parts = text[1:].split(maxsplit=1)
                     command = parts[0].lower()
                     args = parts[1] if len(parts) > 1 else ""
@@ -47,43 +69,60 @@ class MessageHandler:
                     return
 
                 # Check if we should respond to this message
-                should_respond = await self._should_respond(peer_id, user_id, config)
+                should_respond = self._should_respond(is_tracked, config)
 
                 if not should_respond:
                     # Still save to history for context
-                    await self.db.add_message_to_history(peer_id, user_id, text, is_bot=False)
+                    await self._persist(peer_id, [(user_id, text, False)], config)
                     return
 
-                # Get conversation history
-                history = await self.db.get_conversation_history(
+                # Rate limit paid completions per user and per conversation
+                if not self.rate_limiter.acquire(
                     peer_id,
-                    limit=config.get('memory_size', 10)
-                )
-
-                # Add current message to history context
-                history.append({
-                    'user_id': user_id,
-                    'message': text,
-                    'is_bot': False
-                })
-
-                # Generate AI response
-                response = await self.ai.generate_response(
-                    brain_role=config.get('brain_role'),
-                    brain_task=config.get('brain_task'),
-                    conversation_history=history,
-                    response_length=config.get('response_length', 'medium')
-                )
+                    user_id,
+                    user_limit=config.get('user_rate_limit', 6),
+                    peer_limit=config.get('peer_rate_limit', 20)
+                ):
+                    logger.info(f"Rate limit hit for user {user_id} in peer {peer_id}")
+                    await self._persist(peer_id, [(user_id, text, False)], config)
+                    return
+
+                # Show typing while the reply is being prepared
+                typing = asyncio.create_task(self._keep_typing(peer_id))
+                try:
+                    # Get conversation history and recall relevant older messages
+                    # from long-term memory concurrently
+                    history, recalled = await asyncio.gather(
+                        self.db.get_conversation_history(
+                            peer_id,
+                            limit=config.get('memory_size', 10)
+                        ),
+                        self._recall(peer_id, text)
+                    )
+
+                    # Add current message to history context
+                    history.append({
+                        'user_id': user_id,
+                        'message': text,
+                        'is_bot': False
+                    })
+
+                    # Generate AI response
+                    response = await self.ai.generate_response(
+                        brain_role=config.get('brain_role'),
+                        brain_task=config.get('brain_task'),
+                        conversation_history=history,
+                        response_length=config.get('response_length', 'medium'),
+                        recalled_messages=recalled
+                    )
+                finally:
+                    typing.cancel()
 
                 # Send response
                 await message.answer(response)
 
-                # Save messages to history
-                await self.db.add_message_to_history(peer_id, user_id, text, is_bot=False)
-                await self.db.add_message_to_history(peer_id, -1, response, is_bot=True)
-
-                # Clean old history if needed
-                await self.db.clear_old_history(peer_id, keep_last=config.get('memory_size', 10) * 2)
+                # Save messages to history and apply retention after the reply is out
+                await self._persist(peer_id, [(user_id, text, False), (-1, response, True)], config)
 
             except Exception as e:
                 logger.error(f"Error handling message: {e}", exc_info=True)
@@ -92,18 +131,11 @@ class MessageHandler:
                 except:
                     pass
 
-    async def _should_respond(self, peer_id: int, user_id: int, config: dict) -> bool:
+    def _should_respond(self, is_tracked: bool, config: dict) -> bool:
         """Determine if bot should respond to this message."""
 
-        # Check if there are tracked users
-        tracked_users = await self.db.get_tracked_users(peer_id)
-
-        # If no tracked users, don't respond (admin needs to configure first)
-        if not tracked_users:
-            return False
-
-        # Check if user is in tracked list
-        if user_id not in tracked_users:
+        # Only tracked users get replies (admin needs to configure them first)
+        if not is_tracked:
             return False
 
         # Check response percentage
@@ -113,3 +145,40 @@ class MessageHandler:
             return random.randint(1, 100) <= response_percentage
 
         return True
+
+    async def _persist(self, peer_id: int, messages: List[Tuple[int, str, bool]], config: dict):
+        """Queue history writes and retention for a peer as a background task.
+
+        Writes of one peer run in order; submit waits only when the
+        background queue is full.
+        """
+        await self.background.submit(
+            self._save_history(peer_id, messages, config.get('memory_size', 10) * 2),
+            key=peer_id,
+            name="history persistence"
+        )
+
+    async def _save_history(self, peer_id: int, messages: List[Tuple[int, str, bool]], keep_last: int):
+        """Save messages to history and clean old history if needed."""
+        for user_id, text, is_bot in messages:
+            await self.db.add_message_to_history(peer_id, user_id, text, is_bot=is_bot)
+        await self.db.clear_old_history(peer_id, keep_last=keep_last)
+
+    async def _keep_typing(self, peer_id: int):
+        """Send the typing indicator until cancelled (VK shows it for ~5 seconds)."""
+        try:
+            while True:
+                await self.bot.api.messages.set_activity(peer_id=peer_id, type="typing")
+                await asyncio.sleep(self.TYPING_INTERVAL)
+        except Exception as e:
+            logger.debug(f"Failed to send typing indicator: {e}")
+
+    async def _recall(self, peer_id: int, text: str) -> List[Dict[str, Any]]:
+        """Recall older messages from long-term memory; a failure only loses the recall."""
+        if self.memory is None:
+            return []
+        try:
+            return await self.memory.search(peer_id, text)
+        except Exception as e:
+            logger.error(f"Error recalling messages for peer {peer_id}: {e}", exc_info=True)
+            return []
@@ -0,0 +1,86 @@
+import time
+from typing import Callable, Dict, Optional
+
+
+class RateLimiter:
+    """Token-bucket limits for AI replies per (peer, user) and per peer.
+
+    Each bucket holds up to ``limit`` tokens and refills at ``limit`` tokens
+    per minute; a reply costs one token from both the user and the peer
+    bucket. Buckets are kept in virtual-scheduling form (GCRA): a single
+    float per bucket, the time at which it will be full again. A bucket whose
+    time is in the past is full and indistinguishable from a missing one,
+    so idle buckets are dropped by a periodic sweep without changing
+    behaviour.
+    """
+
+    PERIOD = 60.0  # Limits are expressed in replies per minute
+
+    def __init__(self, sweep_interval: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._user_buckets: Dict[int, float] = {}
+        self._peer_buckets: Dict[int, float] = {}
+        self._last_sweep = clock()
+
+    @staticmethod
+    def _user_key(peer_id: int, user_id: int) -> int:
+        """Pack (peer_id, user_id) into one int - cheaper than a tuple key."""
+        return (peer_id << 32) | (user_id & 0xFFFFFFFF)
+
+    def _next_full_time(self, buckets: Dict[int, float], key: int, limit: int, now: float) -> Optional[float]:
+        """Return the bucket's new full time after taking a token, or None if empty."""
+        interval = self.PERIOD / limit
+        full_at = max(buckets.get(key, now), now) + interval
+        # Small tolerance so float rounding doesn't eat the last token of a burst
+        if full_at - now > self.PERIOD + 1e-9:
+            return None
+        return full_at
+
+    def acquire(self, peer_id: int, user_id: int, user_limit: int, peer_limit: int) -> bool:
+        """Take a token from both buckets. A limit of 0 disables that bucket."""
+        now = self._clock()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._sweep(now)
+
+        user_key = self._user_key(peer_id, user_id)
+        user_full_at = peer_full_at = None
+
+        if user_limit > 0:
+            user_full_at = self._next_full_time(self._user_buckets, user_key, user_limit, now)
+            if user_full_at is None:
+                return False
+
+        if peer_limit > 0:
+            peer_full_at = self._next_full_time(self._peer_buckets, peer_id, peer_limit, now)
+            if peer_full_at is None:
+                return False
+
+        # Commit only once both buckets have a token, so a rejected reply
+        # never consumes from the other bucket
+        if user_full_at is not None:
+            self._user_buckets[user_key] = user_full_at
+        if peer_full_at is not None:
+            self._peer_buckets[peer_id] = peer_full_at
+        return True
+
+    def _sweep(self, now: float):
+        """Drop buckets that have refilled completely."""
+        self._user_buckets = {k: t for k, t in self._user_buckets.items() if t > now}
+        self._peer_buckets = {k: t for k, t in self._peer_buckets.items() if t > now}
+        self._last_sweep = now
+
+    def peer_tokens(self, peer_id: int, peer_limit: int) -> int:
+        """Return how many replies the peer bucket allows right now."""
+        if peer_limit <= 0:
+            return 0
+        interval = self.PERIOD / peer_limit
+        used = max(self._peer_buckets.get(peer_id, 0.0) - self._clock(), 0.0)
+        return int((self.PERIOD - used) / interval + 1e-9)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of active (not yet full) buckets."""
+        return {
+            "user_buckets": len(self._user_buckets),
+            "peer_buckets": len(self._peer_buckets),
+        }
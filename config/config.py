@@ -12,6 +12,18 @@ class Config:
     OPENAI_API_KEY = os.getenv("OPEN")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
     DB_PATH = os.getenv("DB_PATH", "bot_data.db")
+    # Number of SQLite files conversations are partitioned across by peer_id
+    DB_SHARDS = int(os.getenv("DB_SHARDS", "1"))
+    # Compressed JSONL file that receives history rows before retention deletes them
+    HISTORY_ARCHIVE_PATH = os.getenv("HISTORY_ARCHIVE_PATH") or None
+    # Long-term retrieval memory: older messages recalled per reply (0 disables).
+    # Opt-in, since it keeps the text of messages removed by retention on disk
+    MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "0"))
+    MEMORY_DIR = os.getenv("MEMORY_DIR", f"{DB_PATH}.memory")
+    # Messages kept in memory per conversation; the oldest are dropped beyond it
+    MEMORY_MAX_MESSAGES = int(os.getenv("MEMORY_MAX_MESSAGES", "50000"))
+    # Most recently active conversations whose caches are prewarmed on startup (0 disables)
+    PREWARM_PEERS = int(os.getenv("PREWARM_PEERS", "200"))
 
     @classmethod
     def validate(cls):
@@ -0,0 +1,148 @@
+import asyncio
+import csv
+import gzip
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+from .filelock import file_lock
+
+
+HISTORY_FIELDS = ("id", "peer_id", "user_id", "message", "is_bot", "timestamp")
+FORMATS = ("jsonl", "csv")
+
+
+def history_record(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a history row to the exported fields."""
+    record = {field: row.get(field) for field in HISTORY_FIELDS}
+    record["is_bot"] = bool(record["is_bot"])
+    return record
+
+
+class HistoryWriter:
+    """Writes conversation_history rows to a gzip-compressed JSONL or CSV file."""
+
+    def __init__(self, path: str, fmt: str = "jsonl"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+
+        self.fmt = fmt
+        self.count = 0
+        self._file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        self._csv = None
+
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=HISTORY_FIELDS)
+            self._csv.writeheader()
+
+    def write(self, row: Dict[str, Any]):
+        """Write a single history row."""
+        row = history_record(row)
+
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def close(self):
+        """Flush and close the underlying file."""
+        self._file.close()
+
+    def __enter__(self) -> "HistoryWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class HistoryArchive:
+    """Shared gzip JSONL archive appended to by retention cleanups.
+
+    Cleanups run concurrently and each one only removes a few rows, so rows
+    are staged as plain JSONL in ``<path>.pending`` and moved into the
+    archive as a single gzip member once ``flush_rows`` have accumulated (and
+    on ``flush()``). Large members compress about as well as one stream.
+
+    The bot and ``database.export --archive`` may share one archive, so all
+    file I/O runs in a worker thread under an OS lock on ``<path>.lock``;
+    the asyncio lock only keeps this process's appends in order.
+
+    Rows are written to the staging file before the caller deletes them, and
+    the staging file is only removed after its member is appended, so a crash
+    may archive rows twice but never loses them.
+    """
+
+    def __init__(self, path: str, flush_rows: int = 1000):
+        self.path = path
+        self.pending_path = path + ".pending"
+        self.lock_path = path + ".lock"
+        self.flush_rows = flush_rows
+        self._staged: Tuple[int, int] = (-1, 0)  # (bytes, rows) of the staging file as last seen
+        self._lock = asyncio.Lock()
+
+    async def append(self, rows: List[Dict[str, Any]]):
+        """Stage history rows, compressing them into the archive when enough are staged."""
+        if not rows:
+            return
+        data = "".join(json.dumps(history_record(row), ensure_ascii=False) + "\n" for row in rows)
+        async with self._lock:
+            await asyncio.to_thread(self._append, data.encode("utf-8"), len(rows))
+
+    async def flush(self):
+        """Compress all staged rows into the archive."""
+        async with self._lock:
+            await asyncio.to_thread(self._flush)
+
+    def _append(self, data: bytes, count: int):
+        with file_lock(self.lock_path):
+            rows = self._staged_rows()
+            with open(self.pending_path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            self._staged = (size, rows + count)
+            if rows + count >= self.flush_rows:
+                self._compact()
+
+    def _flush(self):
+        with file_lock(self.lock_path):
+            self._staged_rows()
+            self._compact()
+
+    def _staged_rows(self) -> int:
+        """Count staged rows, recounting if the file changed since we last saw it.
+
+        That happens on first use and when another process appended or
+        compacted. A partially written line (from a crash) is dropped.
+        """
+        size = os.path.getsize(self.pending_path) if os.path.exists(self.pending_path) else 0
+        if size == self._staged[0]:
+            return self._staged[1]
+        if not size:
+            self._staged = (0, 0)
+            return 0
+
+        with open(self.pending_path, "rb") as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            with open(self.pending_path, "r+b") as f:
+                f.truncate(end)
+        self._staged = (end, data.count(b"\n", 0, end))
+        return self._staged[1]
+
+    def _compact(self):
+        if os.path.exists(self.pending_path):
+            with open(self.pending_path, "rb") as f:
+                data = f.read()
+            if data:
+                # Compress first so the archive only ever gets one complete write
+                member = gzip.compress(data)
+                with open(self.path, "ab") as f:
+                    f.write(member)
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.remove(self.pending_path)
+        self._staged = (0, 0)
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class PeerCache:
+    """Bounded LRU cache of per-peer values for Database.
+
+    Database is the only writer, so it keeps entries current on write. The
+    one race left is a fill (read from SQLite, then store) overlapping a
+    write to the same peer: writes mark in-flight fills stale, and stale
+    fills are not stored.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[int, Any]" = OrderedDict()
+        self._fills: Dict[int, List] = {}  # peer_id -> [in-flight fills, still fresh]
+
+    def get(self, peer_id: int) -> Optional[Any]:
+        """Get a cached value, marking it as recently used."""
+        value = self._data.get(peer_id)
+        if value is not None:
+            self._data.move_to_end(peer_id)
+        return value
+
+    def set(self, peer_id: int, value: Any):
+        """Store a value, evicting the least recently used peers over maxsize."""
+        if self.maxsize <= 0:
+            return
+        self._data[peer_id] = value
+        self._data.move_to_end(peer_id)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, peer_id: int):
+        """Drop a peer's value and mark its in-flight fills stale."""
+        self._data.pop(peer_id, None)
+        self.written(peer_id)
+
+    def written(self, peer_id: int):
+        """Mark in-flight fills stale after a write that updated the value in place."""
+        fill = self._fills.get(peer_id)
+        if fill is not None:
+            fill[1] = False
+
+    def begin_fill(self, peer_id: int):
+        """Register a read from SQLite that will populate the cache."""
+        fill = self._fills.setdefault(peer_id, [0, True])
+        fill[0] += 1
+
+    def end_fill(self, peer_id: int) -> bool:
+        """Finish a fill; returns False if a write happened meanwhile."""
+        fill = self._fills[peer_id]
+        fill[0] -= 1
+        if not fill[0]:
+            del self._fills[peer_id]
+        return fill[1]
+
+    def __len__(self) -> int:
+        return len(self._data)
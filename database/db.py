@@ -1,97 +1,298 @@
 import aiosqlite
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+import asyncio
+import glob
+import os
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, AsyncIterator
+from datetime import datetime, timezone
+
+from .archive import HistoryArchive
+from .cache import PeerCache
+
+if TYPE_CHECKING:
+    from .memory import RetrievalMemory
+
+
+# Per-connection tuning applied to every connection opened by Database.
+# With WAL, synchronous=NORMAL is still crash-safe for the database file and
+# only risks losing the last transactions on power loss.
+SQLITE_PRAGMAS: Dict[str, Any] = {
+    "synchronous": "NORMAL",
+    "cache_size": -16000,       # negative value = size in KiB (~16 MB)
+    "mmap_size": 268435456,     # 256 MB of memory-mapped I/O
+    "busy_timeout": 5000,       # ms to wait for the writer lock instead of failing
+    "temp_store": "MEMORY",
+}
+
+# Schema migrations as (version, statements). Versions are tracked in
+# PRAGMA user_version; every migration above the stored version is applied
+# in order on startup. Never edit a released migration - append a new one.
+MIGRATIONS = [
+    (1, [
+        # Conversations table - stores bot configuration for each conversation
+        """CREATE TABLE IF NOT EXISTS conversations (
+            peer_id INTEGER PRIMARY KEY,
+            admins TEXT NOT NULL DEFAULT '[]',
+            brain_role TEXT,
+            brain_task TEXT,
+            response_length TEXT DEFAULT 'medium',
+            response_percentage INTEGER DEFAULT 100,
+            memory_size INTEGER DEFAULT 10,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        # Tracked users table - users whose messages the bot should respond to
+        """CREATE TABLE IF NOT EXISTS tracked_users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            peer_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(peer_id, user_id),
+            FOREIGN KEY (peer_id) REFERENCES conversations(peer_id)
+        )""",
+        # Conversation history table - stores message history for context
+        """CREATE TABLE IF NOT EXISTS conversation_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            peer_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            is_bot BOOLEAN DEFAULT 0,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (peer_id) REFERENCES conversations(peer_id)
+        )""",
+        """CREATE INDEX IF NOT EXISTS idx_tracked_users_peer
+           ON tracked_users(peer_id)""",
+        """CREATE INDEX IF NOT EXISTS idx_history_peer
+           ON conversation_history(peer_id, timestamp DESC)""",
+    ]),
+    (2, [
+        # timestamp only has second granularity, so messages written in the
+        # same second tie; order history by the monotonic id instead
+        "DROP INDEX IF EXISTS idx_history_peer",
+        """CREATE INDEX IF NOT EXISTS idx_history_peer_id
+           ON conversation_history(peer_id, id DESC)""",
+    ]),
+    (3, [
+        # AI reply rate limits in replies per minute, 0 = unlimited
+        "ALTER TABLE conversations ADD COLUMN user_rate_limit INTEGER DEFAULT 6",
+        "ALTER TABLE conversations ADD COLUMN peer_rate_limit INTEGER DEFAULT 20",
+    ]),
+]
+
+# Most recent history rows kept in memory per peer
+HISTORY_CACHE_ROWS = 100
+
+
+def shard_for(peer_id: int, shards: int) -> int:
+    """Map a peer to a shard index.
+
+    Peer ids are dense and sequential (chats are 2000000000 + n), so they are
+    mixed with a multiplicative (Fibonacci) hash and the high bits of the
+    result pick the shard.
+    """
+    mixed = (peer_id * 2654435761) & 0xFFFFFFFF
+    return (mixed * shards) >> 32
+
+
+def shard_paths(db_path: str, shards: int) -> List[str]:
+    """Get database file paths for a shard count.
+
+    A single shard is db_path itself; otherwise bot_data.db becomes
+    bot_data.shard0-of-4.db ... bot_data.shard3-of-4.db, so layouts with
+    different shard counts never share files.
+    """
+    if shards == 1:
+        return [db_path]
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard{i}-of-{shards}{ext}" for i in range(shards)]
+
+
+def shard_glob(db_path: str) -> str:
+    """Glob pattern matching shard files of any layout for db_path."""
+    root, ext = os.path.splitext(db_path)
+    return f"{glob.escape(root)}.shard*-of-*{ext}"
 
 
 class Database:
-    """Database manager for bot configuration and conversation history."""
+    """Database manager for bot configuration and conversation history.
+
+    With shards > 1, all tables are partitioned by peer_id across separate
+    SQLite files, so writes of different chats don't contend for one writer
+    lock. Per-peer operations touch a single shard.
+
+    Config, tracked users and recent history are cached per peer (up to
+    cache_peers peers) and kept current on write, which assumes this
+    instance is the only writer while the bot runs.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "bot_data.db",
+        pragmas: Optional[Dict[str, Any]] = None,
+        journal_mode: str = "WAL",
+        archive_path: Optional[str] = None,
+        memory: Optional["RetrievalMemory"] = None,
+        shards: int = 1,
+        cache_peers: int = 10000
+    ):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
 
-    def __init__(self, db_path: str = "bot_data.db"):
         self.db_path = db_path
+        self.shards = shards
+        self.shard_paths = shard_paths(db_path, shards)
+        self.archive_path = archive_path
+        self.archive = HistoryArchive(archive_path) if archive_path else None
+        self.memory = memory
+        self.pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+        self.journal_mode = journal_mode
+        self._connections: Dict[str, aiosqlite.Connection] = {}
+        self._connect_lock = asyncio.Lock()
+        self._config_cache = PeerCache(cache_peers)
+        self._tracked_cache = PeerCache(cache_peers)
+        self._history_cache = PeerCache(cache_peers)
+
+    async def init_db(self, check_layout: bool = True):
+        """Initialize database: enable WAL and apply pending schema migrations.
+
+        With shards > 1 every shard file is migrated. Unless check_layout is
+        False, refuses to start on an empty layout while data exists in a
+        layout with a different shard count - use database.reshard first.
+        """
+        if check_layout:
+            self._check_layout()
+
+        for path in self.shard_paths:
+            await self._migrate(path)
+
+    def _check_layout(self):
+        """Fail fast if the configured shard count doesn't match the files on disk."""
+        if any(os.path.exists(path) for path in self.shard_paths):
+            return
 
-    async def init_db(self):
-        """Initialize database with required tables."""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Conversations table - stores bot configuration for each conversation
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS conversations (
-                    peer_id INTEGER PRIMARY KEY,
-                    admins TEXT NOT NULL DEFAULT '[]',
-                    brain_role TEXT,
-                    brain_task TEXT,
-                    response_length TEXT DEFAULT 'medium',
-                    response_percentage INTEGER DEFAULT 100,
-                    memory_size INTEGER DEFAULT 10,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # Tracked users table - users whose messages the bot should respond to
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS tracked_users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    peer_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(peer_id, user_id),
-                    FOREIGN KEY (peer_id) REFERENCES conversations(peer_id)
+        other_layouts = [
+            path for path in [self.db_path] + glob.glob(shard_glob(self.db_path))
+            if os.path.exists(path) and path not in self.shard_paths
+        ]
+        if other_layouts:
+            raise RuntimeError(
+                f"No database files for {self.shards} shard(s), but found "
+                f"{', '.join(sorted(other_layouts))}. Reshard with "
+                f"'python -m database.reshard' or fix the shard count."
+            )
+
+    async def _migrate(self, path: str):
+        """Enable WAL and apply pending schema migrations to one database file."""
+        async with self._connect(path) as db:
+            # journal_mode is persistent in the database file, so it only
+            # needs to be set once rather than on every connection
+            await db.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+
+            cursor = await db.execute("PRAGMA user_version")
+            current_version = (await cursor.fetchone())[0]
+            latest_version = MIGRATIONS[-1][0]
+
+            if current_version > latest_version:
+                raise RuntimeError(
+                    f"Database schema version {current_version} is newer than "
+                    f"supported version {latest_version}"
                 )
-            """)
-
-            # Conversation history table - stores message history for context
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS conversation_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    peer_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    message TEXT NOT NULL,
-                    is_bot BOOLEAN DEFAULT 0,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (peer_id) REFERENCES conversations(peer_id)
+
+            for version, statements in MIGRATIONS:
+                if version <= current_version:
+                    continue
+
+                # Each migration runs in its own transaction together with the
+                # user_version bump, so a failed step leaves the schema untouched
+                await db.execute("BEGIN IMMEDIATE")
+                try:
+                    for statement in statements:
+                        await db.execute(statement)
+                    await db.execute(f"PRAGMA user_version = {version}")
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    raise
+
+    @asynccontextmanager
+    async def _connect(self, path: str) -> AsyncIterator[aiosqlite.Connection]:
+        """Yield the long-lived connection of a database file, opening it on first use.
+
+        One connection per file keeps the page cache and memory map warm
+        across calls, and the pragmas are applied only once. Every write is
+        committed right away, so coroutines sharing it never leave a
+        transaction open for each other.
+        """
+        db = self._connections.get(path)
+        if db is None:
+            async with self._connect_lock:
+                db = self._connections.get(path)
+                if db is None:
+                    db = aiosqlite.connect(path)
+                    # Don't keep the process alive if close() is never called
+                    db.daemon = True
+                    await db
+                    db.row_factory = aiosqlite.Row
+                    for name, value in self.pragmas.items():
+                        await db.execute(f"PRAGMA {name} = {value}")
+                    self._connections[path] = db
+        yield db
+
+    async def close(self):
+        """Flush the history archive and close all database connections."""
+        if self.archive is not None:
+            await self.archive.flush()
+        connections, self._connections = self._connections, {}
+        for db in connections.values():
+            await db.close()
+
+    def _path_for(self, peer_id: int) -> str:
+        """Get the database file holding a peer's data."""
+        return self.shard_paths[shard_for(peer_id, self.shards)]
+
+    async def get_conversation(self, peer_id: int) -> Optional[Dict[str, Any]]:
+        """Get conversation config, or None if the conversation doesn't exist."""
+        config = self._config_cache.get(peer_id)
+        if config is not None:
+            return dict(config)
+
+        self._config_cache.begin_fill(peer_id)
+        try:
+            async with self._connect(self._path_for(peer_id)) as db:
+                cursor = await db.execute(
+                    "SELECT * FROM conversations WHERE peer_id = ?",
+                    (peer_id,)
                 )
-            """)
-
-            # Create indexes for better performance
-            await db.execute("""
-                CREATE INDEX IF NOT EXISTS idx_tracked_users_peer
-                ON tracked_users(peer_id)
-            """)
-            await db.execute("""
-                CREATE INDEX IF NOT EXISTS idx_history_peer
-                ON conversation_history(peer_id, timestamp DESC)
-            """)
+                row = await cursor.fetchone()
+        finally:
+            fresh = self._config_cache.end_fill(peer_id)
 
-            await db.commit()
+        if not row:
+            return None
+
+        config = dict(row)
+        if fresh:
+            self._config_cache.set(peer_id, config)
+        return dict(config)
 
     async def get_or_create_conversation(self, peer_id: int, admin_id: int) -> Dict[str, Any]:
         """Get conversation config or create if not exists."""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-
-            cursor = await db.execute(
-                "SELECT * FROM conversations WHERE peer_id = ?",
-                (peer_id,)
-            )
-            row = await cursor.fetchone()
-
-            if row:
-                return dict(row)
+        config = await self.get_conversation(peer_id)
+        if config is not None:
+            return config
 
+        async with self._connect(self._path_for(peer_id)) as db:
             # Create new conversation with admin as first admin
+            # (OR IGNORE: a concurrent message may have created it first)
             await db.execute(
-                """INSERT INTO conversations (peer_id, admins)
+                """INSERT OR IGNORE INTO conversations (peer_id, admins)
                    VALUES (?, ?)""",
                 (peer_id, f'[{admin_id}]')
             )
             await db.commit()
 
-            cursor = await db.execute(
-                "SELECT * FROM conversations WHERE peer_id = ?",
-                (peer_id,)
-            )
-            row = await cursor.fetchone()
-            return dict(row)
+        self._config_cache.invalidate(peer_id)
+        return await self.get_conversation(peer_id)
 
     async def update_conversation(self, peer_id: int, **kwargs):
         """Update conversation configuration."""
@@ -101,16 +302,17 @@ class Database:
         set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
         values = list(kwargs.values()) + [peer_id]
 
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect(self._path_for(peer_id)) as db:
             await db.execute(
                 f"UPDATE conversations SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE peer_id = ?",
                 values
             )
             await db.commit()
+        self._config_cache.invalidate(peer_id)
 
     async def add_admin(self, peer_id: int, user_id: int) -> bool:
         """Add admin to conversation."""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect(self._path_for(peer_id)) as db:
             cursor = await db.execute(
                 "SELECT admins FROM conversations WHERE peer_id = ?",
                 (peer_id,)
@@ -129,12 +331,13 @@ class Database:
                     (json.dumps(admins), peer_id)
                 )
                 await db.commit()
+                self._config_cache.invalidate(peer_id)
 
             return True
 
     async def remove_admin(self, peer_id: int, user_id: int) -> bool:
         """Remove admin from conversation."""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect(self._path_for(peer_id)) as db:
             cursor = await db.execute(
                 "SELECT admins FROM conversations WHERE peer_id = ?",
                 (peer_id,)
@@ -153,28 +356,23 @@ class Database:
                     (json.dumps(admins), peer_id)
                 )
                 await db.commit()
+                self._config_cache.invalidate(peer_id)
 
             return True
 
     async def is_admin(self, peer_id: int, user_id: int) -> bool:
         """Check if user is admin in conversation."""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                "SELECT admins FROM conversations WHERE peer_id = ?",
-                (peer_id,)
-            )
-            row = await cursor.fetchone()
+        config = await self.get_conversation(peer_id)
+        if not config:
+            return False
 
-            if not row:
-                return False
-
-            import json
-            admins = json.loads(row[0])
-            return user_id in admins
+        import json
+        admins = json.loads(config['admins'])
+        return user_id in admins
 
     async def add_tracked_user(self, peer_id: int, user_id: int):
         """Add user to tracking list."""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect(self._path_for(peer_id)) as db:
             try:
                 await db.execute(
                     "INSERT INTO tracked_users (peer_id, user_id) VALUES (?, ?)",
@@ -183,38 +381,49 @@ class Database:
                 await db.commit()
             except aiosqlite.IntegrityError:
                 pass  # Already exists
+        self._tracked_cache.invalidate(peer_id)
 
     async def remove_tracked_user(self, peer_id: int, user_id: int):
         """Remove user from tracking list."""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect(self._path_for(peer_id)) as db:
             await db.execute(
                 "DELETE FROM tracked_users WHERE peer_id = ? AND user_id = ?",
                 (peer_id, user_id)
             )
             await db.commit()
+        self._tracked_cache.invalidate(peer_id)
 
     async def get_tracked_users(self, peer_id: int) -> List[int]:
         """Get list of tracked users for conversation."""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                "SELECT user_id FROM tracked_users WHERE peer_id = ?",
-                (peer_id,)
-            )
-            rows = await cursor.fetchall()
-            return [row[0] for row in rows]
+        users = self._tracked_cache.get(peer_id)
+        if users is not None:
+            return list(users)
+
+        self._tracked_cache.begin_fill(peer_id)
+        try:
+            async with self._connect(self._path_for(peer_id)) as db:
+                cursor = await db.execute(
+                    "SELECT user_id FROM tracked_users WHERE peer_id = ?",
+                    (peer_id,)
+                )
+                rows = await cursor.fetchall()
+        finally:
+            fresh = self._tracked_cache.end_fill(peer_id)
+
+        users = [row[0] for row in rows]
+        if fresh:
+            self._tracked_cache.set(peer_id, users)
+        return list(users)
 
     async def is_tracked_user(self, peer_id: int, user_id: int) -> bool:
         """Check if user is tracked."""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                "SELECT 1 FROM tracked_users WHERE peer_id = ? AND user_id = ?",
-                (peer_id, user_id)
-            )
-            return await cursor.fetchone() is not None
+        # Tracking lists are short, so loading (and caching) the whole list
+        # is as cheap as a single-row lookup
+        return user_id in await self.get_tracked_users(peer_id)
 
     async def add_message_to_history(self, peer_id: int, user_id: int, message: str, is_bot: bool = False):
         """Add message to conversation history."""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect(self._path_for(peer_id)) as db:
             await db.execute(
                 """INSERT INTO conversation_history (peer_id, user_id, message, is_bot)
                    VALUES (?, ?, ?, ?)""",
@@ -222,34 +431,205 @@ class Database:
             )
             await db.commit()
 
+        entry = self._history_cache.get(peer_id)
+        if entry is not None:
+            entry['rows'].append({
+                'user_id': user_id,
+                'message': message,
+                'is_bot': int(is_bot),
+                # Same format as SQLite's CURRENT_TIMESTAMP
+                'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            if len(entry['rows']) > HISTORY_CACHE_ROWS:
+                del entry['rows'][:-HISTORY_CACHE_ROWS]
+                entry['complete'] = False
+        self._history_cache.written(peer_id)
+
     async def get_conversation_history(self, peer_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent conversation history."""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        entry = self._history_cache.get(peer_id) if limit > 0 else None
+        if entry is not None and (entry['complete'] or len(entry['rows']) >= limit):
+            return [dict(row) for row in entry['rows'][-limit:]]
+
+        self._history_cache.begin_fill(peer_id)
+        try:
+            async with self._connect(self._path_for(peer_id)) as db:
+                cursor = await db.execute(
+                    """SELECT user_id, message, is_bot, timestamp
+                       FROM conversation_history
+                       WHERE peer_id = ?
+                       ORDER BY id DESC
+                       LIMIT ?""",
+                    (peer_id, limit)
+                )
+                rows = await cursor.fetchall()
+        finally:
+            fresh = self._history_cache.end_fill(peer_id)
+
+        # Return in chronological order (oldest first)
+        history = [dict(row) for row in reversed(rows)]
+        if fresh and 0 < limit <= HISTORY_CACHE_ROWS:
+            self._history_cache.set(peer_id, {
+                'rows': [dict(row) for row in history],
+                # Fewer rows than asked for means this is the whole history
+                'complete': len(history) < limit,
+            })
+        return history
+
+    async def iter_history(
+        self,
+        peer_id: Optional[int] = None,
+        up_to_id: Optional[int] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream history rows ordered by (peer_id, id) with constant memory.
+
+        Uses keyset pagination: peers are walked in order, and each batch
+        resumes after the last id seen instead of using OFFSET, so every page
+        is an index range scan on (peer_id, id). Without peer_id this is a
+        cross-shard query: shards are read one after another, each in order.
+        """
+        id_filter = "AND id <= ?" if up_to_id is not None else ""
+        id_params = [up_to_id] if up_to_id is not None else []
+        paths = [self._path_for(peer_id)] if peer_id is not None else self.shard_paths
+
+        for path in paths:
+            async with self._connect(path) as db:
+                current_peer = peer_id
+                if current_peer is None:
+                    current_peer = await self._next_history_peer(db, None)
+
+                while current_peer is not None:
+                    last_id = 0
+                    while True:
+                        cursor = await db.execute(
+                            f"""SELECT id, peer_id, user_id, message, is_bot, timestamp
+                                FROM conversation_history
+                                WHERE peer_id = ? AND id > ? {id_filter}
+                                ORDER BY id
+                                LIMIT ?""",
+                            [current_peer, last_id] + id_params + [batch_size]
+                        )
+                        rows = await cursor.fetchall()
+
+                        for row in rows:
+                            yield dict(row)
+
+                        if len(rows) < batch_size:
+                            break
+                        last_id = rows[-1]['id']
+
+                    if peer_id is not None:
+                        return
+                    current_peer = await self._next_history_peer(db, current_peer)
+
+    @staticmethod
+    async def _next_history_peer(db: aiosqlite.Connection, after: Optional[int]) -> Optional[int]:
+        """Get the smallest peer_id with history greater than after."""
+        if after is None:
+            cursor = await db.execute("SELECT MIN(peer_id) FROM conversation_history")
+        else:
+            cursor = await db.execute(
+                "SELECT MIN(peer_id) FROM conversation_history WHERE peer_id > ?",
+                (after,)
+            )
+        row = await cursor.fetchone()
+        return row[0]
+
+    async def get_history_peers(self) -> List[int]:
+        """Get ids of all conversations that have stored history (cross-shard)."""
+        peers = []
+        for path in self.shard_paths:
+            async with self._connect(path) as db:
+                cursor = await db.execute("SELECT DISTINCT peer_id FROM conversation_history")
+                rows = await cursor.fetchall()
+                peers.extend(row[0] for row in rows)
+        return sorted(peers)
+
+    async def get_recent_peers(self, limit: int) -> List[int]:
+        """Get the most recently active conversations by latest history timestamp (cross-shard)."""
+        recent = []
+        for path in self.shard_paths:
+            async with self._connect(path) as db:
+                cursor = await db.execute(
+                    """SELECT peer_id, MAX(timestamp) AS last_active
+                       FROM conversation_history
+                       GROUP BY peer_id
+                       ORDER BY last_active DESC
+                       LIMIT ?""",
+                    (limit,)
+                )
+                recent.extend(await cursor.fetchall())
+
+        recent.sort(key=lambda row: row[1], reverse=True)
+        return [row[0] for row in recent[:limit]]
+
+    async def prewarm(self, peer_ids: List[int], concurrency: int = 8):
+        """Load config, tracked users and recent history of peers into the caches."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(peer_id: int):
+            async with semaphore:
+                config = await self.get_conversation(peer_id)
+                if config is None:
+                    return
+                await self.get_tracked_users(peer_id)
+                await self.get_conversation_history(peer_id, limit=config.get('memory_size', 10))
+
+        await asyncio.gather(*(warm(peer_id) for peer_id in peer_ids))
+
+    async def clear_old_history(self, peer_id: int, keep_last: int = 10) -> int:
+        """Clear old messages, keeping only the most recent ones.
+
+        If archive_path is set, the removed rows are appended to the compressed
+        archive before they are deleted; if a retrieval memory is attached they
+        are indexed into it. Returns the number of deleted rows.
+        """
+        async with self._connect(self._path_for(peer_id)) as db:
+            # Newest message that falls outside the retention window
             cursor = await db.execute(
-                """SELECT user_id, message, is_bot, timestamp
-                   FROM conversation_history
+                """SELECT id FROM conversation_history
                    WHERE peer_id = ?
-                   ORDER BY timestamp DESC
-                   LIMIT ?""",
-                (peer_id, limit)
+                   ORDER BY id DESC
+                   LIMIT 1 OFFSET ?""",
+                (peer_id, keep_last)
             )
-            rows = await cursor.fetchall()
-            # Return in chronological order (oldest first)
-            return [dict(row) for row in reversed(rows)]
+            row = await cursor.fetchone()
+            if not row:
+                return 0
+            cutoff_id = row[0]
 
-    async def clear_old_history(self, peer_id: int, keep_last: int = 10):
-        """Clear old messages, keeping only the most recent ones."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                """DELETE FROM conversation_history
-                   WHERE peer_id = ?
-                   AND id NOT IN (
-                       SELECT id FROM conversation_history
-                       WHERE peer_id = ?
-                       ORDER BY timestamp DESC
-                       LIMIT ?
-                   )""",
-                (peer_id, peer_id, keep_last)
+        if self.archive is not None or self.memory is not None:
+            await self._archive_history(peer_id, cutoff_id)
+
+        async with self._connect(self._path_for(peer_id)) as db:
+            cursor = await db.execute(
+                "DELETE FROM conversation_history WHERE peer_id = ? AND id <= ?",
+                (peer_id, cutoff_id)
             )
             await db.commit()
+
+        # Cached rows beyond keep_last may have been deleted
+        entry = self._history_cache.get(peer_id)
+        if entry is not None and len(entry['rows']) > keep_last:
+            del entry['rows'][:-keep_last or None]
+            entry['complete'] = False
+        self._history_cache.written(peer_id)
+        return cursor.rowcount
+
+    async def _archive_history(self, peer_id: int, up_to_id: int, batch_size: int = 1000):
+        """Hand history rows of a peer up to up_to_id to the archive and memory."""
+        batch: List[Dict[str, Any]] = []
+        async for row in self.iter_history(peer_id, up_to_id=up_to_id, batch_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                await self._archive_batch(peer_id, batch)
+                batch = []
+        if batch:
+            await self._archive_batch(peer_id, batch)
+
+    async def _archive_batch(self, peer_id: int, rows: List[Dict[str, Any]]):
+        if self.archive is not None:
+            await self.archive.append(rows)
+        if self.memory is not None:
+            await self.memory.add_messages(peer_id, rows)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Export conversation history to compressed JSONL or CSV.
+
+Rows are streamed with keyset pagination, so memory use stays constant
+regardless of database size.
+
+Usage:
+    python -m database.export --output history.jsonl.gz
+    python -m database.export --peer 2000000001 --format csv --output chat.csv.gz
+    python -m database.export --archive --keep-last 20 --output archive.jsonl.gz
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config  # noqa: E402
+from database.archive import FORMATS, HistoryWriter  # noqa: E402
+from database.db import Database  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+async def export_history(db: Database, output: str, fmt: str, peer_id=None, batch_size: int = 1000) -> int:
+    """Stream history for one peer (or all peers) into a compressed file."""
+    with HistoryWriter(output, fmt) as writer:
+        async for row in db.iter_history(peer_id, batch_size=batch_size):
+            writer.write(row)
+        return writer.count
+
+
+async def archive_history(db: Database, keep_last: int, peer_id=None) -> int:
+    """Move rows outside the retention window into db.archive_path (and db.memory, if set)."""
+    peers = [peer_id] if peer_id is not None else await db.get_history_peers()
+    total = 0
+    for peer in peers:
+        total += await db.clear_old_history(peer, keep_last=keep_last)
+    return total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Export conversation history.")
+    parser.add_argument("--db", default=Config.DB_PATH, help="database path")
+    parser.add_argument("--shards", type=int, default=Config.DB_SHARDS, help="number of database shards")
+    parser.add_argument("--peer", type=int, help="export a single conversation")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--output", required=True, help="gzip-compressed output file")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--archive", action="store_true",
+        help="append rows outside the retention window to --output and delete them"
+    )
+    parser.add_argument("--keep-last", type=int, default=20, help="rows to keep per peer in archive mode")
+    args = parser.parse_args()
+
+    if args.archive:
+        if args.format != "jsonl":
+            parser.error("archive mode only supports jsonl")
+        memory = None
+        if Config.MEMORY_TOP_K > 0:
+            # Index the archived rows like retention in the bot does
+            from database.memory import RetrievalMemory
+            memory = RetrievalMemory(
+                Config.MEMORY_DIR,
+                top_k=Config.MEMORY_TOP_K,
+                max_messages=Config.MEMORY_MAX_MESSAGES
+            )
+        db = Database(args.db, archive_path=args.output, memory=memory, shards=args.shards)
+        try:
+            await db.init_db()
+            count = await archive_history(db, args.keep_last, args.peer)
+        finally:
+            await db.close()
+        logger.info(f"Archived {count} messages to {args.output}")
+    else:
+        db = Database(args.db, shards=args.shards)
+        try:
+            await db.init_db()
+            count = await export_history(db, args.output, args.format, args.peer, args.batch_size)
+        finally:
+            await db.close()
+        logger.info(f"Exported {count} messages to {args.output}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,19 @@
+import fcntl
+from contextlib import contextmanager
+from typing import Iterator
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on path across processes (blocking).
+
+    The bot and the export CLI may write the same archive and memory files
+    at the same time; asyncio locks only cover one process. The lock file
+    is created if missing and left in place.
+    """
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
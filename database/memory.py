@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import weakref
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .filelock import file_lock
+
+if TYPE_CHECKING:
+    import numpy as np
+    from .vector_index import HashingVectorizer, PeerIndex
+
+
+def rebase_ids(directory: str) -> int:
+    """Shift the history ids stored in every index of directory to <= 0.
+
+    Resharding renumbers conversation_history, so new ids may be lower than
+    ones already indexed and would be skipped as duplicates. Shifting keeps
+    the stored order while any new id compares greater. Returns the number
+    of indexes rewritten.
+    """
+    rebased = 0
+    for name in os.listdir(directory):
+        if not name.endswith(".jsonl"):
+            continue
+        path = os.path.join(directory, name)
+        with open(path, "rb") as f:
+            # A partially written last line is dropped; load() trims the vectors
+            records = [json.loads(line) for line in f if line.endswith(b"\n")]
+        if not records:
+            continue
+
+        shift = records[-1]['id']
+        with open(path + ".tmp", "wb") as f:
+            for record in records:
+                record['id'] -= shift
+                f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        os.replace(path + ".tmp", path)
+        rebased += 1
+    return rebased
+
+
+class RetrievalMemory:
+    """Long-term per-peer memory of messages that left the history window.
+
+    Messages removed by retention are embedded and appended to a per-peer
+    PeerIndex persisted in ``directory``; the most similar ones are recalled
+    for the current message, keeping up to ``max_messages`` per peer.
+    Indexes are only loaded for search, and the offsets of the most recently
+    searched ones are kept, up to ``max_loaded_peers``; appends go straight
+    to disk. Each peer has its own lock, so loading one
+    index never blocks the others; the index files are also locked with
+    flock, so the bot and ``database.export --archive`` can share
+    ``directory``.
+
+    NumPy (via .vector_index) is imported on first use, not on construction,
+    so enabling memory doesn't slow down startup; ``warm_up`` imports it in
+    a worker thread ahead of the first message.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        dim: int = 256,
+        top_k: int = 3,
+        min_score: float = 0.15,
+        max_loaded_peers: int = 64,
+        max_messages: Optional[int] = 50000
+    ):
+        self.directory = directory
+        self.dim = dim
+        self._vectorizer: Optional["HashingVectorizer"] = None
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_loaded_peers = max_loaded_peers
+        self.max_messages = max_messages
+        self._indexes: "OrderedDict[int, PeerIndex]" = OrderedDict()
+        self._locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def vectorizer(self) -> "HashingVectorizer":
+        """The vectorizer, importing NumPy on first use."""
+        if self._vectorizer is None:
+            from .vector_index import HashingVectorizer
+            self._vectorizer = HashingVectorizer(self.dim)
+        return self._vectorizer
+
+    async def warm_up(self):
+        """Import NumPy in a worker thread so the first message doesn't pay for it."""
+        await asyncio.to_thread(lambda: self.vectorizer)
+
+    def _lock(self, peer_id: int) -> asyncio.Lock:
+        """Get the lock guarding a peer's index files."""
+        lock = self._locks.get(peer_id)
+        if lock is None:
+            lock = self._locks[peer_id] = asyncio.Lock()
+        return lock
+
+    def _new_index(self, peer_id: int) -> "PeerIndex":
+        from .vector_index import PeerIndex
+        return PeerIndex(os.path.join(self.directory, f"{peer_id}.{self.dim}"), self.dim, self.max_messages)
+
+    def _get_index(self, peer_id: int) -> "PeerIndex":
+        """Get the cached index of a peer; it is (re)loaded by _search_index.
+
+        Must be called with the peer's lock held.
+        """
+        index = self._indexes.get(peer_id)
+        if index is None:
+            index = self._new_index(peer_id)
+            self._indexes[peer_id] = index
+            while len(self._indexes) > self.max_loaded_peers:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(peer_id)
+        return index
+
+    async def add_messages(self, peer_id: int, rows: List[Dict[str, Any]]):
+        """Embed and store history rows of a peer."""
+        records = [
+            {
+                'id': row['id'],
+                'user_id': row['user_id'],
+                'is_bot': bool(row['is_bot']),
+                'message': row['message'],
+            }
+            for row in rows if row.get('message')
+        ]
+        if not records:
+            return
+
+        async with self._lock(peer_id):
+            vectors = await asyncio.to_thread(self.vectorizer.transform, [r['message'] for r in records])
+            # Without a loaded index, append to disk only; the vectors are read on the next search
+            index = self._indexes.get(peer_id) or self._new_index(peer_id)
+            await asyncio.to_thread(self._add_to_index, index, vectors, records)
+
+    async def search(self, peer_id: int, text: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Recall the stored messages most similar to text, most similar first."""
+        k = self.top_k if k is None else k
+        if k <= 0 or not text:
+            return []
+
+        async with self._lock(peer_id):
+            query = self.vectorizer.transform([text])[0]
+            hits = await asyncio.to_thread(self._search_index, self._get_index(peer_id), query, k)
+
+        records = []
+        for score, record in hits:
+            record['score'] = score
+            records.append(record)
+        return records
+
+    @staticmethod
+    def _add_to_index(index: "PeerIndex", vectors: "np.ndarray", records: List[Dict[str, Any]]):
+        with file_lock(index.lock_path):
+            index.refresh(load=False)
+            index.add(vectors, records)
+
+    def _search_index(self, index: "PeerIndex", query: "np.ndarray", k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        with file_lock(index.lock_path):
+            index.refresh()
+            if not index.size:
+                return []
+            hits = index.search(query, k, self.min_score)
+            records = index.get([row for _, row in hits])
+        return [(score, record) for (score, _), record in zip(hits, records)]
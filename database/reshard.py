@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Copy a database into a layout with a different number of shards.
+
+The source files are left untouched; once the copy is done, set DB_SHARDS to
+the new count and remove the old files. Stop the bot while resharding.
+
+History ids are renumbered in the target layout, so the ids stored in the
+long-term memory indexes (--memory-dir) are rebased to match.
+
+Usage:
+    python -m database.reshard --from-shards 1 --to-shards 4
+    python -m database.reshard --from-shards 4 --to-shards 8 --db bot_data.db
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config  # noqa: E402
+from database.db import Database, shard_for  # noqa: E402
+from database.memory import rebase_ids  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("conversations", "tracked_users", "conversation_history")
+# Autoincrement ids repeat across shards, so they are assigned anew on copy
+RENUMBERED_TABLES = ("tracked_users", "conversation_history")
+
+
+async def reshard(db_path: str, from_shards: int, to_shards: int, batch_size: int = 5000) -> Dict[str, int]:
+    """Copy every row into its target shard, reading sources in rowid batches."""
+    source = Database(db_path, shards=from_shards)
+    target = Database(db_path, shards=to_shards)
+
+    missing = [path for path in source.shard_paths if not os.path.exists(path)]
+    if missing:
+        raise RuntimeError(f"Source database files not found: {', '.join(missing)}")
+    existing = [path for path in target.shard_paths if os.path.exists(path)]
+    if existing:
+        raise RuntimeError(f"Target database files already exist: {', '.join(existing)}")
+
+    counts = {table: 0 for table in TABLES}
+    try:
+        # Bring sources up to date so both layouts share the same schema
+        await source.init_db()
+        await target.init_db(check_layout=False)
+
+        for source_path in source.shard_paths:
+            async with source._connect(source_path) as src:
+                for table in TABLES:
+                    counts[table] += await _copy_table(src, target, table, batch_size)
+    except BaseException:
+        await target.close()
+        _remove_files(target.shard_paths)
+        raise
+    finally:
+        await source.close()
+        await target.close()
+
+    return counts
+
+
+def _remove_files(paths: List[str]):
+    """Remove a partially written layout, including its WAL files."""
+    for path in paths:
+        for name in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(name):
+                os.remove(name)
+
+
+async def _copy_table(src, target: Database, table: str, batch_size: int) -> int:
+    """Copy one table of one source shard.
+
+    Rows of a peer all come from one source shard and are inserted in rowid
+    order, so renumbered ids keep each conversation's message order.
+    """
+    copied = 0
+    last_rowid = None
+    while True:
+        # conversations uses peer_id as its rowid, the other tables use id
+        cursor = await src.execute(
+            f"SELECT rowid, * FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid if last_rowid is not None else -2**63, batch_size)
+        )
+        rows = await cursor.fetchall()
+        if not rows:
+            return copied
+
+        columns = [d[0] for d in cursor.description][1:]
+        keep = [i for i, column in enumerate(columns) if not (column == "id" and table in RENUMBERED_TABLES)]
+        columns = [columns[i] for i in keep]
+        peer_index = columns.index("peer_id")
+
+        by_shard: Dict[int, List[tuple]] = {}
+        for row in rows:
+            values = tuple(row[1 + i] for i in keep)
+            by_shard.setdefault(shard_for(values[peer_index], target.shards), []).append(values)
+
+        placeholders = ", ".join("?" for _ in columns)
+        for shard, values in by_shard.items():
+            async with target._connect(target.shard_paths[shard]) as dst:
+                await dst.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                    values
+                )
+                await dst.commit()
+
+        copied += len(rows)
+        last_rowid = rows[-1][0]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Reshard the bot database.")
+    parser.add_argument("--db", default=Config.DB_PATH, help="database path")
+    parser.add_argument("--from-shards", type=int, default=Config.DB_SHARDS)
+    parser.add_argument("--to-shards", type=int, required=True)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--memory-dir",
+        help="long-term memory directory (default: MEMORY_DIR, or <db>.memory with --db)"
+    )
+    args = parser.parse_args()
+    memory_dir = args.memory_dir or (Config.MEMORY_DIR if args.db == Config.DB_PATH else f"{args.db}.memory")
+
+    if args.from_shards == args.to_shards:
+        parser.error("--from-shards and --to-shards must differ")
+
+    counts = await reshard(args.db, args.from_shards, args.to_shards, args.batch_size)
+    for table, count in counts.items():
+        logger.info(f"Copied {count} rows of {table}")
+    if os.path.isdir(memory_dir):
+        rebased = rebase_ids(memory_dir)
+        logger.info(f"Rebased message ids of {rebased} memory indexes in {memory_dir}")
+    else:
+        logger.info(
+            f"No memory directory at {memory_dir}; if long-term memory is kept elsewhere, run "
+            f"python -c \"from database.memory import rebase_ids; rebase_ids('<dir>')\" before starting the bot"
+        )
+    logger.info(f"Done. Set DB_SHARDS={args.to_shards} and remove the old database files.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,297 @@
+import json
+import os
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class HashingVectorizer:
+    """Dependency-free text embedding using hashed word and char n-gram features.
+
+    Each word and each character trigram of `` word `` is hashed (crc32) into
+    one of ``dim`` buckets with a hash-derived sign, and the resulting vector
+    is L2-normalized, so a dot product is the cosine similarity.
+    """
+
+    TOKEN_RE = re.compile(r"\w+")
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str) -> Iterable[str]:
+        for word in self.TOKEN_RE.findall(text.lower()):
+            yield word
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+
+    def transform(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into an (n, dim) float32 matrix of unit vectors."""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(f.encode("utf-8")) for f in self._features(text)),
+                dtype=np.uint32
+            )
+            if not hashes.size:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+            matrix[row] = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class PeerIndex:
+    """Append-only vector index for one conversation.
+
+    Vectors are raw float32 rows in ``<base>.vec``, which search scans
+    through a memory map instead of holding a copy; the messages themselves
+    are appended to ``<base>.jsonl`` and only read back for search hits, by
+    byte offset, so a loaded index keeps just the offsets in memory. Each
+    record stores its row number, so an index can also be opened for
+    appending only (``open_tail``) without reading the text file.
+
+    With ``max_rows`` set, the oldest rows are dropped once the index grows
+    a quarter past it; both files are rewritten and swapped in an order
+    that ``_finish_trim`` can complete after a crash.
+
+    The files may be shared by several processes (the bot and the export
+    CLI); callers hold an OS lock on ``<base>.lock`` and call ``refresh``
+    before using an index they opened earlier.
+    """
+
+    TAIL_CHUNK = 4096
+
+    def __init__(self, base_path: str, dim: int, max_rows: Optional[int] = None):
+        self.vec_path = base_path + ".vec"
+        self.text_path = base_path + ".jsonl"
+        self.lock_path = base_path + ".lock"
+        self.dim = dim
+        self.max_rows = max_rows
+        self.size = 0
+        self.last_id = 0
+        self.loaded = False
+        self._text_end = 0
+        self._offsets = np.zeros(0, dtype=np.int64)
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dim * 4
+
+    def load(self):
+        """Read the record offsets, dropping any partially written tail."""
+        self.loaded = True
+        self._finish_trim()
+        if not (os.path.exists(self.vec_path) and os.path.exists(self.text_path)):
+            return
+
+        vector_rows = os.path.getsize(self.vec_path) // self.row_bytes
+
+        offsets = []
+        position = 0
+        with open(self.text_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offsets.append(position)
+                position += len(line)
+
+        size = min(vector_rows, len(offsets))
+        text_end = offsets[size] if size < len(offsets) else position
+        if self._file_sizes() != (size * self.row_bytes, text_end):
+            # A crash between the two appends leaves them out of step
+            self._truncate(size, text_end)
+
+        self._offsets = np.zeros(0, dtype=np.int64)
+        self.size = 0
+        self._reserve(size)
+        self._offsets[:size] = offsets[:size]
+        self.size = size
+        self._text_end = text_end
+        if size:
+            self.last_id = self.get([size - 1])[0]['id']
+
+    def open_tail(self):
+        """Prepare the index for appending without loading it.
+
+        Size and last_id come from the last complete record; a partially
+        written tail is dropped the same way load() would. Falls back to a
+        full load() when the files don't line up.
+        """
+        self._finish_trim()
+        if not (os.path.exists(self.vec_path) and os.path.exists(self.text_path)):
+            return self.load()
+
+        record, text_end = self._last_record()
+        size = record['row'] + 1 if record is not None and 'row' in record else 0
+        vector_bytes = os.path.getsize(self.vec_path)
+        if (record is not None and 'row' not in record) or vector_bytes < size * self.row_bytes:
+            return self.load()
+
+        # Vectors are written first, so a crash can only leave extra vector rows
+        if (vector_bytes, os.path.getsize(self.text_path)) != (size * self.row_bytes, text_end):
+            self._truncate(size, text_end)
+
+        self.size = size
+        self.last_id = record['id'] if record is not None else 0
+        self._text_end = text_end
+
+    def refresh(self, load: bool = True):
+        """Bring the index in step with its files, which another process may have changed.
+
+        An index that is already loaded is reloaded only if the file sizes
+        changed; otherwise it is loaded, or with load=False opened for
+        appending only.
+        """
+        if self.loaded:
+            if self._file_sizes() == (self.size * self.row_bytes, self._text_end):
+                return
+            self.load()
+        elif load:
+            self.load()
+        else:
+            self.open_tail()
+
+    def _file_sizes(self) -> Tuple[int, int]:
+        return tuple(
+            os.path.getsize(path) if os.path.exists(path) else 0
+            for path in (self.vec_path, self.text_path)
+        )
+
+    def _truncate(self, size: int, text_end: int):
+        with open(self.vec_path, "r+b") as f:
+            f.truncate(size * self.row_bytes)
+        with open(self.text_path, "r+b") as f:
+            f.truncate(text_end)
+
+    def _last_record(self) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Read the last complete record and the end offset of complete lines."""
+        with open(self.text_path, "rb") as f:
+            position = f.seek(0, os.SEEK_END)
+            data = b""
+            while position > 0:
+                step = min(self.TAIL_CHUNK, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+                end = data.rfind(b"\n")
+                if end == -1:
+                    continue
+                start = data.rfind(b"\n", 0, end) + 1
+                if start or not position:
+                    return json.loads(data[start:end]), position + end + 1
+        return None, 0
+
+    def add(self, vectors: np.ndarray, records: List[Dict[str, Any]]):
+        """Append embedded records to disk, and their offsets if the index is loaded.
+
+        Records must arrive in increasing id order; ids already stored are
+        skipped, so re-archiving after an interrupted cleanup is harmless.
+        """
+        new = [i for i, r in enumerate(records) if r['id'] > self.last_id]
+        if len(new) != len(records):
+            vectors = vectors[new]
+            records = [records[i] for i in new]
+        count = len(records)
+        if not count:
+            return
+
+        lines = [
+            (json.dumps(dict(r, row=self.size + i), ensure_ascii=False) + "\n").encode("utf-8")
+            for i, r in enumerate(records)
+        ]
+        with open(self.vec_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self.text_path, "ab") as f:
+            start = f.tell()
+            f.write(b"".join(lines))
+            self._text_end = f.tell()
+
+        if self.loaded:
+            self._reserve(self.size + count)
+            self._offsets[self.size:self.size + count] = start + np.cumsum([0] + [len(line) for line in lines[:-1]])
+        self.size += count
+        self.last_id = records[-1]['id']
+
+        if self.max_rows and self.size > self.max_rows + self.max_rows // 4:
+            self.trim(self.max_rows)
+
+    def _reserve(self, capacity: int):
+        """Grow the offsets geometrically so appends stay amortized O(1)."""
+        if capacity <= len(self._offsets):
+            return
+        offsets = np.zeros(max(capacity, len(self._offsets) * 2, 64), dtype=np.int64)
+        offsets[:self.size] = self._offsets[:self.size]
+        self._offsets = offsets
+
+    def trim(self, keep: int):
+        """Drop the oldest rows, keeping the newest ``keep``."""
+        drop = self.size - keep
+        if drop <= 0:
+            return
+
+        # Write both new files, swap the text in, then the vectors; a crash
+        # in between is completed (or rolled back) by _finish_trim
+        with open(self.text_path, "rb") as src, open(self.text_path + ".tmp", "wb") as dst:
+            for row, line in enumerate(src):
+                if row >= self.size:
+                    break
+                if row >= drop:
+                    record = json.loads(line)
+                    record['row'] = row - drop
+                    dst.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            dst.flush()
+            os.fsync(dst.fileno())
+        with open(self.vec_path, "rb") as src, open(self.vec_path + ".tmp", "wb") as dst:
+            src.seek(drop * self.row_bytes)
+            remaining = keep * self.row_bytes
+            while remaining:
+                chunk = src.read(min(remaining, 1 << 20))
+                dst.write(chunk)
+                remaining -= len(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(self.text_path + ".tmp", self.text_path)
+        os.replace(self.vec_path + ".tmp", self.vec_path)
+
+        if self.loaded:
+            self.load()
+        else:
+            self.open_tail()
+
+    def _finish_trim(self):
+        """Complete or roll back a trim interrupted by a crash."""
+        vec_tmp, text_tmp = self.vec_path + ".tmp", self.text_path + ".tmp"
+        if os.path.exists(text_tmp):
+            # The text was not swapped in yet, so the old files are intact
+            os.remove(text_tmp)
+            if os.path.exists(vec_tmp):
+                os.remove(vec_tmp)
+        elif os.path.exists(vec_tmp):
+            os.replace(vec_tmp, self.vec_path)
+
+    def search(self, query: np.ndarray, k: int, min_score: float = 0.0) -> List[Tuple[float, int]]:
+        """Return up to k (score, row) pairs with the highest cosine similarity."""
+        if not self.size or k <= 0:
+            return []
+
+        vectors = np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(self.size, self.dim))
+        scores = vectors @ query
+        del vectors
+        k = min(k, self.size)
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(float(scores[i]), int(i)) for i in top if scores[i] >= min_score]
+
+    def get(self, rows: List[int]) -> List[Dict[str, Any]]:
+        """Read the stored records for the given rows."""
+        records = []
+        with open(self.text_path, "rb") as f:
+            for row in rows:
+                f.seek(int(self._offsets[row]))
+                records.append(json.loads(f.readline()))
+        return records
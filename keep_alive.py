@@ -1,13 +1,16 @@
-from flask import Flask
 from threading import Thread
 
-app = Flask('')
-
-@app.route('/')
-def home():
-    return "VK Bot is alive!"
 
 def run():
+    # Imported in the server thread so flask doesn't delay bot startup
+    from flask import Flask
+
+    app = Flask('')
+
+    @app.route('/')
+    def home():
+        return "VK Bot is alive!"
+
     app.run(host='0.0.0.0', port=80)
 
 def keep_alive():
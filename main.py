@@ -8,12 +8,15 @@ with AI-generated messages based on customizable personality and settings.
 
 import asyncio
 import logging
+import time
 import vkbottle
 import os
+from typing import Optional
 from vkbottle.bot import Bot
 
 from config.config import Config
 from database.db import Database
+from database.memory import RetrievalMemory
 from bot.ai import AIManager
 from bot.handlers import MessageHandler
 from keep_alive import keep_alive
@@ -26,6 +29,14 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def prewarm(db: Database, ai: AIManager, memory: Optional[RetrievalMemory], peers: int):
+    """Warm caches of recently active chats, the OpenAI client and NumPy after polling starts."""
+    started = time.perf_counter()
+    peer_ids = await db.get_recent_peers(peers)
+    await asyncio.gather(db.prewarm(peer_ids), ai.warm_up(), *([memory.warm_up()] if memory else []))
+    logger.info(f"Prewarmed {len(peer_ids)} conversations in {time.perf_counter() - started:.2f}s")
+
+
 async def main():
     """Main entry point for the bot."""
     try:
@@ -33,8 +44,23 @@ async def main():
         Config.validate()
         logger.info("Configuration validated successfully")
 
+        # Initialize long-term memory
+        memory = None
+        if Config.MEMORY_TOP_K > 0:
+            memory = RetrievalMemory(
+                Config.MEMORY_DIR,
+                top_k=Config.MEMORY_TOP_K,
+                max_messages=Config.MEMORY_MAX_MESSAGES
+            )
+            logger.info(f"Retrieval memory enabled in {Config.MEMORY_DIR}")
+
         # Initialize database
-        db = Database(Config.DB_PATH)
+        db = Database(
+            Config.DB_PATH,
+            archive_path=Config.HISTORY_ARCHIVE_PATH,
+            memory=memory,
+            shards=Config.DB_SHARDS
+        )
         await db.init_db()
         logger.info("Database initialized successfully")
 
@@ -49,13 +75,22 @@ async def main():
         logger.info("Bot initialized successfully")
 
         # Register handlers
-        handler = MessageHandler(bot, db, ai)
+        handler = MessageHandler(bot, db, ai, memory)
         handler.register_handlers()
         logger.info("Message handlers registered successfully")
 
+        # Prewarm in the background so polling starts right away
+        if Config.PREWARM_PEERS > 0:
+            await handler.background.submit(prewarm(db, ai, memory, Config.PREWARM_PEERS), name="startup prewarm")
+
         # Start bot
         logger.info("Starting bot...")
-        await bot.run_polling()
+        try:
+            await bot.run_polling()
+        finally:
+            # Let queued history writes finish before exiting
+            await handler.background.drain()
+            await db.close()
 
     except ValueError as e:
         logger.error(f"Configuration error: {e}")